@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Log Index Module for cmdlog2tex
+
+Sidecar index (``<log>.idx``) for ``.ansilog`` transcripts: byte offsets of
+every line, command boundaries and the SGR state at periodic checkpoints.
+With the index, a line range or a single command can be extracted without
+rescanning the transcript from the start.
+
+File layout (little-endian)::
+
+    magic     8 bytes  b"ANSIDX\\x00\\x01"
+    meta_len  uint32   length of the JSON metadata that follows
+    meta      JSON     source size/mtime, counts, checkpoints, ...
+    offsets   uint64 * (lines + 1)   start offset of each line, then EOF
+    commands  uint32 * commands      0-based line number of each prompt
+
+Offsets refer to the decompressed stream for compressed logs.
+"""
+
+import array
+import json
+import os
+import re
+import struct
+import sys
+
+from .compression import open_log
+from .fsutil import replace_file
+
+INDEX_MAGIC = b"ANSIDX\x00\x01"
+INDEX_SUFFIX = ".idx"
+CHECKPOINT_INTERVAL = 1024
+
+SGR_PATTERN = re.compile(rb"\x1b\[([0-9;]*)m")
+HEADER_PATTERN = re.compile(rb"^Script started on (\S+ \S+)")
+
+# 命令边界：提示符行通常带有 OSC 0/2（窗口标题）或 OSC 7（当前目录）序列，
+# 否则按去除ANSI后的常见提示符形式匹配（如 "user@host:~$ "、"bash-5.2# "）
+PROMPT_OSC_PATTERN = re.compile(rb"\x1b\][027];")
+ANSI_PATTERN = re.compile(rb"\x1b(?:\][^\x07\x1b]*(?:\x07|\x1b\\)|\[[0-9;?]*[a-zA-Z])")
+PROMPT_TEXT_PATTERN = re.compile(rb"^(?:\([^)\s]*\) )?\S*?[\w~/\]][$#] ")
+
+
+def index_path(log_path):
+    """获取日志文件对应的索引文件路径"""
+    return log_path + INDEX_SUFFIX
+
+
+def _is_prompt_line(line):
+    if PROMPT_OSC_PATTERN.search(line):
+        return True
+    return bool(PROMPT_TEXT_PATTERN.match(ANSI_PATTERN.sub(b"", line)))
+
+
+def _last_sgr(data, start, end):
+    """返回 data[start:end] 中最后一个 SGR 序列的参数，不存在时返回 None"""
+    pos = end
+    while True:
+        pos = data.rfind(b"\x1b[", start, pos)
+        if pos < 0:
+            return None
+        match = SGR_PATTERN.match(data, pos, end)
+        if match:
+            return match.group(1).decode("ascii")
+
+
+def _to_le(arr):
+    if sys.byteorder == "big":
+        arr = array.array(arr.typecode, arr)
+        arr.byteswap()
+    return arr
+
+
+class LogIndex:
+    """Line/command index of an ``.ansilog`` transcript."""
+
+    def __init__(self, offsets, commands, checkpoints, meta=None):
+        """
+        Args:
+            offsets: 每行起始偏移（array('Q')），末尾附加文件总长度
+            commands: 每个命令提示符所在行号（0起，array('I')）
+            checkpoints: [(行号, 该行之前生效的SGR参数或None), ...]
+            meta: 其他元数据（源文件大小、修改时间、开始时间等）
+        """
+        self.offsets = offsets
+        self.commands = commands
+        self.checkpoints = checkpoints
+        self.meta = meta or {}
+
+    @property
+    def line_count(self):
+        return len(self.offsets) - 1
+
+    @property
+    def header_length(self):
+        """script 头部行的字节长度（无头部时为 0）"""
+        if "started" in self.meta and self.line_count:
+            return self.offsets[1]
+        return 0
+
+    @classmethod
+    def build(cls, data, checkpoint_interval=CHECKPOINT_INTERVAL):
+        """
+        从日志原始字节构建索引
+
+        Args:
+            data: 日志内容（已解压的 bytes）
+            checkpoint_interval: SGR 状态检查点间隔（行数）
+        """
+        offsets = array.array("Q", [0])
+        commands = array.array("I")
+        checkpoints = []
+        state = None
+        prev_cp = 0
+
+        pos = 0
+        lineno = 0
+        size = len(data)
+        while pos < size:
+            if lineno % checkpoint_interval == 0:
+                sgr = _last_sgr(data, prev_cp, pos)
+                if sgr is not None:
+                    state = sgr
+                checkpoints.append((lineno, state))
+                prev_cp = pos
+            nl = data.find(b"\n", pos)
+            end = size if nl < 0 else nl + 1
+            if _is_prompt_line(data[pos:end]):
+                commands.append(lineno)
+            offsets.append(end)
+            pos = end
+            lineno += 1
+
+        meta = {"checkpoint_interval": checkpoint_interval}
+        header = HEADER_PATTERN.match(data)
+        if header:
+            meta["started"] = header.group(1).decode("ascii", "replace")
+        return cls(offsets, commands, checkpoints, meta)
+
+    @classmethod
+    def load(cls, path):
+        """从索引文件加载索引"""
+        with open(path, "rb") as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"not a log index file: {path}")
+            (meta_len,) = struct.unpack("<I", f.read(4))
+            meta = json.loads(f.read(meta_len).decode("utf-8"))
+            offsets = array.array("Q")
+            offsets.frombytes(f.read(8 * (meta["lines"] + 1)))
+            commands = array.array("I")
+            commands.frombytes(f.read(4 * meta["commands"]))
+        if len(offsets) != meta["lines"] + 1 or len(commands) != meta["commands"]:
+            raise ValueError(f"truncated log index file: {path}")
+        offsets = _to_le(offsets)
+        commands = _to_le(commands)
+        checkpoints = [tuple(cp) for cp in meta.pop("checkpoints")]
+        return cls(offsets, commands, checkpoints, meta)
+
+    def save(self, path):
+        """将索引写入文件"""
+        meta = dict(self.meta)
+        meta["lines"] = self.line_count
+        meta["commands"] = len(self.commands)
+        meta["checkpoints"] = self.checkpoints
+        meta_bytes = json.dumps(meta, sort_keys=True).encode("utf-8")
+        # 通过临时文件 + 重命名写入，并行运行时不会读到写了一半的索引
+        replace_file(
+            path,
+            b"".join(
+                [
+                    INDEX_MAGIC,
+                    struct.pack("<I", len(meta_bytes)),
+                    meta_bytes,
+                    _to_le(self.offsets).tobytes(),
+                    _to_le(self.commands).tobytes(),
+                ]
+            ),
+        )
+
+    def is_current(self, log_path):
+        """检查索引是否与日志文件（大小与修改时间）一致"""
+        try:
+            st = os.stat(log_path)
+        except OSError:
+            return False
+        return (
+            self.meta.get("source_size") == st.st_size
+            and self.meta.get("source_mtime") == st.st_mtime_ns
+        )
+
+    def command_lines(self, number):
+        """
+        获取第 number 个命令（1起）的行范围
+
+        Returns:
+            tuple: (起始行, 结束行)，0起、左闭右开
+        """
+        if not 1 <= number <= len(self.commands):
+            raise ValueError(
+                f"command {number} out of range (log has {len(self.commands)} commands)"
+            )
+        start = self.commands[number - 1]
+        end = (
+            self.commands[number] if number < len(self.commands) else self.line_count
+        )
+        return start, end
+
+    def state_at(self, f, line):
+        """
+        获取第 line 行（0起）开头处生效的SGR参数
+
+        从最近的检查点开始扫描，读取量不超过一个检查点间隔。
+
+        Returns:
+            str: SGR参数，无颜色状态时返回 None
+        """
+        cp_line, state = 0, None
+        for cp, sgr in self.checkpoints:
+            if cp > line:
+                break
+            cp_line, state = cp, sgr
+        cp_offset = self.offsets[cp_line]
+        length = self.offsets[line] - cp_offset
+        if length > 0:
+            f.seek(cp_offset)
+            sgr = _last_sgr(f.read(length), 0, length)
+            if sgr is not None:
+                state = sgr
+        return state
+
+    def clamp(self, start, end):
+        """将行范围限制在日志行数之内"""
+        start = max(0, min(start, self.line_count))
+        end = max(start, min(end, self.line_count))
+        return start, end
+
+    def read_lines(self, f, start, end, with_state=True):
+        """
+        从已打开的日志文件中读取 [start, end) 行
+
+        默认在开头补上该位置生效的SGR序列，使切片单独转换时颜色保持正确。
+
+        Args:
+            f: 日志的二进制文件对象（支持 seek）
+            start: 起始行（0起）
+            end: 结束行（不含）
+            with_state: 是否补上起始处的SGR序列
+
+        Returns:
+            bytes: 切片内容
+        """
+        start, end = self.clamp(start, end)
+        state = self.state_at(f, start) if with_state else None
+        f.seek(self.offsets[start])
+        data = f.read(self.offsets[end] - self.offsets[start])
+        if state:
+            data = b"\x1b[" + state.encode("ascii") + b"m" + data
+        return data
+
+
+def build_index(log_path, save=True):
+    """
+    为日志文件构建索引
+
+    Args:
+        log_path: 日志文件路径（可为压缩文件）
+        save: 是否写入 <log>.idx
+
+    Returns:
+        LogIndex: 构建的索引
+    """
+    st = os.stat(log_path)
+    with open_log(log_path) as f:
+        data = f.read()
+    index = LogIndex.build(data)
+    index.meta["source_size"] = st.st_size
+    index.meta["source_mtime"] = st.st_mtime_ns
+    if save:
+        index.save(index_path(log_path))
+    return index
+
+
+def load_index(log_path):
+    """
+    加载日志文件的索引，缺失或过期时重新构建并保存
+
+    Returns:
+        LogIndex: 与日志文件一致的索引
+    """
+    path = index_path(log_path)
+    if os.path.exists(path):
+        try:
+            index = LogIndex.load(path)
+            if index.is_current(log_path):
+                return index
+        except (ValueError, KeyError, OSError, struct.error):
+            pass
+    try:
+        return build_index(log_path)
+    except OSError:
+        # 索引文件不可写时仅在内存中使用
+        return build_index(log_path, save=False)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Conversion Cache Module for cmdlog2tex
+
+Persistent on-disk cache of generated LaTeX documents, keyed by the hash of
+the input log and the conversion options, with LRU eviction.
+"""
+
+import hashlib
+import json
+import os
+
+from . import __version__
+from .fsutil import file_matches, replace_file
+
+DEFAULT_CACHE_SIZE_MB = 256
+
+# 转换结果格式版本：转换器输出发生任何变化时必须递增，使旧缓存条目失效
+CACHE_FORMAT_VERSION = 2
+
+
+class ConversionCache:
+    """On-disk LRU cache of converted ``.tex`` documents."""
+
+    ENTRY_SUFFIX = ".tex"
+    STAMP_SUFFIX = ".used"
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录（不存在时自动创建）
+            max_size: 缓存总大小上限（字节），超出时按最近使用时间淘汰
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data, options):
+        """
+        计算缓存键
+
+        Args:
+            data: 输入日志的原始字节
+            options: 影响输出的转换选项（dict，如 mode/theme）
+
+        Returns:
+            str: 十六进制 SHA-256 摘要
+        """
+        h = hashlib.sha256()
+        h.update(data)
+        options = dict(options, format=CACHE_FORMAT_VERSION, version=__version__)
+        h.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        return h.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + self.ENTRY_SUFFIX)
+
+    def _touch(self, key):
+        # 使用独立的时间戳文件记录最近使用时间，避免修改缓存条目本身
+        # （条目可能被硬链接到输出目录，其 mtime 不应变化）
+        stamp = os.path.join(self.cache_dir, key[:2], key + self.STAMP_SUFFIX)
+        with open(stamp, "a"):
+            pass
+        os.utime(stamp, None)
+
+    def lookup(self, key):
+        """查找缓存条目，命中时返回条目路径并更新使用时间，否则返回 None"""
+        path = self._entry_path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            self._touch(key)
+        except OSError:
+            pass
+        return path
+
+    def store(self, key, data):
+        """写入缓存条目（bytes），随后执行淘汰"""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        replace_file(path, data)
+        self._touch(key)
+        self.evict()
+        return path
+
+    def materialize(self, key, dst, link=False):
+        """
+        将缓存条目输出到 dst
+
+        目标内容已完全一致时不做任何操作，从而保留其时间戳。
+
+        Args:
+            key: 缓存键
+            dst: 输出文件路径
+            link: 是否优先使用硬链接（失败时回退为复制）
+
+        Returns:
+            bool: 目标文件是否被更新
+        """
+        src = self._entry_path(key)
+        if os.path.exists(dst) and (
+            os.path.samefile(src, dst) or _same_content(src, dst)
+        ):
+            return False
+        if link:
+            # 临时文件名包含进程号，避免并行运行时互相覆盖
+            tmp = f"{dst}.{os.getpid()}.tmp-link"
+            try:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                os.link(src, tmp)
+                os.replace(tmp, dst)
+                return True
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        with open(src, "rb") as f:
+            replace_file(dst, f.read())
+        return True
+
+    def evict(self):
+        """按最近使用时间淘汰条目，直到总大小不超过上限"""
+        entries = []
+        total = 0
+        for sub in os.listdir(self.cache_dir):
+            subdir = os.path.join(self.cache_dir, sub)
+            if not os.path.isdir(subdir):
+                continue
+            for name in os.listdir(subdir):
+                if not name.endswith(self.ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(subdir, name)
+                stamp = path[: -len(self.ENTRY_SUFFIX)] + self.STAMP_SUFFIX
+                try:
+                    size = os.path.getsize(path)
+                    used = os.path.getmtime(stamp if os.path.exists(stamp) else path)
+                except OSError:
+                    continue
+                entries.append((used, path, stamp, size))
+                total += size
+
+        entries.sort()
+        for used, path, stamp, size in entries:
+            if total <= self.max_size:
+                break
+            for p in (path, stamp):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total -= size
+
+
+def _same_content(a, b):
+    with open(a, "rb") as f:
+        return file_matches(b, f.read())
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Capture Module for cmdlog2tex
+
+Run a shell under 'script' and stream its transcript into the log file.
+When post-processing is needed (on-the-fly compression, output caps),
+'script' writes into a named pipe that is drained by a background thread.
+
+Sessions can be bounded by wall-clock timeouts (per session and per
+command), CPU/memory rlimits on the child shell and a byte/line cap on the
+captured output. Anything cut short is recorded as a note at the end of
+the log, so it shows up in the generated LaTeX.
+"""
+
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .compression import open_log_writer
+
+# 超时后先发送 SIGTERM，等待该时长（秒）后仍未退出则发送 SIGKILL
+KILL_GRACE = 3.0
+
+
+class CaptureLimits:
+    """Resource limits of a capture session."""
+
+    def __init__(
+        self,
+        timeout=None,
+        command_timeout=None,
+        cpu_limit=None,
+        mem_limit=None,
+        max_bytes=None,
+        max_lines=None,
+    ):
+        """
+        Args:
+            timeout: 整个会话的墙钟时间上限（秒）
+            command_timeout: 单个命令的墙钟时间上限（秒）
+            cpu_limit: 子进程的 CPU 时间上限（秒，RLIMIT_CPU）
+            mem_limit: 子进程的地址空间上限（MB，RLIMIT_AS）
+            max_bytes: 记录到日志的最大字节数，超出部分只计数不记录
+            max_lines: 记录到日志的最大行数，超出部分只计数不记录
+        """
+        self.timeout = timeout
+        self.command_timeout = command_timeout
+        self.cpu_limit = cpu_limit
+        self.mem_limit = mem_limit
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+
+    @property
+    def caps_output(self):
+        return self.max_bytes is not None or self.max_lines is not None
+
+    def apply_rlimits(self, pid=0):
+        """
+        对进程设置 CPU/内存 rlimit（子进程继承）
+
+        Args:
+            pid: 目标进程，0 表示当前进程（用于 preexec_fn）
+        """
+        limits = []
+        if self.cpu_limit:
+            limits.append((resource.RLIMIT_CPU, int(self.cpu_limit)))
+        if self.mem_limit:
+            limits.append((resource.RLIMIT_AS, int(self.mem_limit) * 1024 * 1024))
+        for which, value in limits:
+            if pid:
+                resource.prlimit(pid, which, (value, value))
+            else:
+                resource.setrlimit(which, (value, value))
+
+
+class LogSink:
+    """Write transcript bytes to the log file, optionally compressed and capped."""
+
+    def __init__(
+        self, path, compress=None, max_bytes=None, max_lines=None, flush=False
+    ):
+        """
+        Args:
+            path: 日志文件路径
+            compress: 压缩格式（None 表示不压缩）
+            max_bytes: 最多记录的字节数（None 表示不限）
+            max_lines: 最多记录的行数（None 表示不限）
+            flush: 是否每次写入后立即刷新（实时跟踪日志时需要）
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.flush = flush
+        self.bytes_written = 0
+        self.lines_written = 0
+        self.bytes_discarded = 0
+        self.lines_discarded = 0
+        self._file = open_log_writer(path, compress)
+
+    @property
+    def truncated(self):
+        return self.bytes_discarded > 0
+
+    def _allowed(self, data):
+        """计算 data 中仍可记录的字节数"""
+        allowed = len(data)
+        if self.max_bytes is not None:
+            allowed = min(allowed, max(0, self.max_bytes - self.bytes_written))
+        if self.max_lines is not None:
+            remaining = self.max_lines - self.lines_written
+            if remaining <= 0:
+                return 0
+            pos = -1
+            for _ in range(remaining):
+                pos = data.find(b"\n", pos + 1, allowed)
+                if pos < 0:
+                    break
+            else:
+                allowed = pos + 1
+        return allowed
+
+    def write(self, data):
+        """写入数据；达到上限后多余部分只计数、不记录"""
+        allowed = self._allowed(data)
+        if allowed:
+            kept = data[:allowed]
+            self._file.write(kept)
+            self.bytes_written += allowed
+            self.lines_written += kept.count(b"\n")
+            if self.flush:
+                self._file.flush()
+        if allowed < len(data):
+            rest = data[allowed:]
+            self.bytes_discarded += len(rest)
+            self.lines_discarded += rest.count(b"\n")
+
+    def truncation_note(self):
+        """截断说明文字"""
+        return (
+            f"output truncated: {self.bytes_discarded} bytes "
+            f"({self.lines_discarded} lines) discarded"
+        )
+
+    def write_note(self, text):
+        """写入不受上限约束的说明文字"""
+        self._file.write(text.encode("utf-8"))
+
+    def close(self):
+        self._file.close()
+
+
+def _pump(fifo_path, sink):
+    """从命名管道读取 script 的输出并写入 sink，直到写端关闭"""
+    with open(fifo_path, "rb", buffering=0) as fifo:
+        while True:
+            chunk = fifo.read(65536)
+            if not chunk:
+                break
+            sink.write(chunk)
+
+
+def _process_table():
+    """读取 /proc，返回 {pid: (ppid, 进程名)}"""
+    table = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 格式: pid (comm) state ppid ...；comm 中可能含空格和括号
+        lparen = stat.find(b"(")
+        rparen = stat.rfind(b")")
+        fields = stat[rparen + 2 :].split()
+        name = stat[lparen + 1 : rparen].decode(errors="replace")
+        table[int(entry)] = (int(fields[1]), name)
+    return table
+
+
+def descendants(pid, table=None):
+    """返回 pid 的所有后代进程（广度优先）"""
+    table = _process_table() if table is None else table
+    children = {}
+    for child, (ppid, _) in table.items():
+        children.setdefault(ppid, []).append(child)
+    result = []
+    queue = [pid]
+    while queue:
+        for child in children.get(queue.pop(0), []):
+            result.append(child)
+            queue.append(child)
+    return result
+
+
+def kill_tree(pids, grace=KILL_GRACE):
+    """
+    先发送 SIGTERM 与 SIGHUP，超过 grace 秒后对仍存活的进程发送 SIGKILL
+
+    交互式 shell 会忽略 SIGTERM，但收到 SIGHUP 时退出。
+    """
+    for pid in pids:
+        for sig in (signal.SIGTERM, signal.SIGHUP):
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+    deadline = time.monotonic() + grace
+    alive = list(pids)
+    while alive and time.monotonic() < deadline:
+        time.sleep(0.1)
+        alive = [pid for pid in alive if _alive(pid)]
+    for pid in alive:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            # 僵尸进程视为已退出
+            return f.read().rsplit(b")", 1)[1].split()[0] != b"Z"
+    except (OSError, IndexError):
+        return False
+
+
+class CommandWatchdog(threading.Thread):
+    """
+    Kill commands of a shell that exceed a wall-clock limit.
+
+    The shell is the topmost descendant of ``root_pid`` whose command line
+    is ``shell_argv``; its direct children are the running commands.
+    """
+
+    def __init__(self, root_pid, shell_argv, timeout, notes, poll=0.5):
+        """
+        Args:
+            root_pid: script（或直接是shell）的进程号
+            shell_argv: shell 的命令行参数列表（如 ['bash', '--login', '-i']）
+            timeout: 单个命令的时间上限（秒）
+            notes: 超时说明的收集列表
+            poll: 轮询间隔（秒）
+        """
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.shell_argv = [arg.encode() for arg in shell_argv]
+        self.timeout = timeout
+        self.notes = notes
+        self.poll = poll
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def _find_shell(self, table):
+        for pid in [self.root_pid] + descendants(self.root_pid, table):
+            try:
+                with open(f"/proc/{pid}/cmdline", "rb") as f:
+                    argv = f.read().split(b"\0")[:-1]
+            except OSError:
+                continue
+            if argv == self.shell_argv:
+                return pid
+        return None
+
+    def run(self):
+        shell_pid = None
+        first_seen = {}
+        while not self._stop_event.wait(self.poll):
+            try:
+                table = _process_table()
+            except OSError:
+                continue
+            if shell_pid is None or shell_pid not in table:
+                shell_pid = self._find_shell(table)
+                if shell_pid is None:
+                    continue
+            now = time.monotonic()
+            commands = [pid for pid, (ppid, _) in table.items() if ppid == shell_pid]
+            first_seen = {pid: first_seen.get(pid, now) for pid in commands}
+            for pid in commands:
+                if now - first_seen[pid] < self.timeout:
+                    continue
+                name = table[pid][1]
+                note = f"command '{name}' (pid {pid}) killed after {self.timeout:g}s timeout"
+                print(f"\n[cmd2tex] Warning: {note}", file=sys.stderr)
+                self.notes.append(note)
+                kill_tree(descendants(pid, table)[::-1] + [pid])
+                first_seen[pid] = float("inf")
+
+
+def write_notes(log_file, notes, sink=None):
+    """在日志末尾追加说明（超时、截断等），使其出现在生成的LaTeX中"""
+    if not notes:
+        return
+    text = "".join(f"[cmd2tex] {note}\n" for note in notes)
+    if sink is not None:
+        sink.write_note("\n" + text)
+    else:
+        with open(log_file, "ab") as f:
+            f.write(("\n" + text).encode("utf-8"))
+
+
+def run_script(
+    cmd_str,
+    log_file,
+    compress=None,
+    timing_file=None,
+    flush=False,
+    limits=None,
+    shell_argv=None,
+):
+    """
+    通过 script 执行命令并记录终端输出
+
+    Args:
+        cmd_str: 传给 script -c 的命令字符串
+        log_file: 日志文件路径
+        compress: 压缩格式（None 表示不压缩）
+        timing_file: 时间文件路径（script -T），None 表示不记录
+        flush: 是否每次输出后立即刷新日志文件（实时跟踪日志时需要）
+        limits: CaptureLimits，None 表示不限制
+        shell_argv: shell 的命令行参数列表，用于识别单个命令（command_timeout）
+
+    Returns:
+        int: script 的退出码
+    """
+    limits = limits or CaptureLimits()
+    timing_args = ["-T", timing_file] if timing_file else []
+    preexec = limits.apply_rlimits if (limits.cpu_limit or limits.mem_limit) else None
+    notes = []
+
+    sink = None
+    tmpdir = None
+    pump = None
+    if compress is None and not limits.caps_output:
+        # 由 script 直接写入日志文件
+        flush_args = ["-f"] if flush else []
+        script_cmd = ["script", *flush_args, *timing_args, "-c", cmd_str, log_file]
+    else:
+        tmpdir = tempfile.mkdtemp(prefix="cmd2tex-")
+        fifo_path = os.path.join(tmpdir, "transcript")
+        os.mkfifo(fifo_path)
+        sink = LogSink(
+            log_file,
+            compress,
+            max_bytes=limits.max_bytes,
+            max_lines=limits.max_lines,
+            flush=flush,
+        )
+        pump = threading.Thread(target=_pump, args=(fifo_path, sink), daemon=True)
+        pump.start()
+        # -f: 每次输出后立即刷新，保证管道另一端实时收到数据
+        script_cmd = ["script", "-f", *timing_args, "-c", cmd_str, fifo_path]
+
+    try:
+        proc = subprocess.Popen(script_cmd, preexec_fn=preexec)
+        watchdog = None
+        if limits.command_timeout and shell_argv:
+            watchdog = CommandWatchdog(
+                proc.pid, shell_argv, limits.command_timeout, notes
+            )
+            watchdog.start()
+        try:
+            returncode = proc.wait(timeout=limits.timeout)
+        except subprocess.TimeoutExpired:
+            note = f"session killed after {limits.timeout:g}s timeout"
+            print(f"\n[cmd2tex] Warning: {note}", file=sys.stderr)
+            notes.append(note)
+            # 结束 shell 及其命令，script 随之正常退出并写完日志
+            kill_tree(descendants(proc.pid)[::-1])
+            try:
+                returncode = proc.wait(timeout=KILL_GRACE)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                returncode = proc.wait()
+        if watchdog is not None:
+            watchdog.stop()
+
+        if pump is not None:
+            # 若 script 未曾打开管道（如启动失败），读线程会阻塞在 open 上，
+            # 此处短暂打开写端使其收到 EOF 后退出
+            try:
+                os.close(os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+            pump.join()
+
+        if sink is not None and sink.truncated:
+            note = sink.truncation_note()
+            print(f"[cmd2tex] Warning: {note}", file=sys.stderr)
+            notes.append(note)
+        write_notes(log_file, notes, sink)
+    finally:
+        if sink is not None:
+            sink.close()
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    return returncode
@@ -13,8 +13,18 @@ import argparse
 import os
 import sys
 import subprocess
+import shlex
 import shutil
 from . import add_common_args, set_mode_defaults
+from .capture import CaptureLimits, run_script
+from .shellpool import connect_pool, default_socket_path, run_pooled
+from .ansindex import build_index, index_path
+from .timing import timing_path
+from .compression import (
+    COMPRESSION_FORMATS,
+    COMPRESSION_SUFFIXES,
+    compression_available,
+)
 
 
 def check_dependencies():
@@ -33,7 +43,10 @@ def parse_args():
         description="Execute command stream and convert to LaTeX.",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""Environment Variables:
-  CMD2TEX_SHELL      - Default shell (default: bash --login -i)""",
+  CMD2TEX_SHELL      - Default shell (default: bash --login -i)
+  CMD2TEX_COMPRESS   - Default .ansilog compression: gz/bz2/xz/zst (default: none)
+  CMD2TEX_POOL       - Use the warm shell pool when set to 1 (see cmd2tex-pool)
+  CMD2TEX_POOL_SOCKET - Shell pool socket (default: $XDG_RUNTIME_DIR/cmd2tex-pool.sock)""",
     )
 
     parser.add_argument(
@@ -50,12 +63,97 @@ def parse_args():
     parser.add_argument(
         "--no-log", action="store_true", help="删除生成的.ansilog文件（默认保留）"
     )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="同时生成 .ansilog.idx 索引（行偏移、命令边界、颜色检查点），便于 log2tex --lines/--command 快速切片",
+    )
+    parser.add_argument(
+        "--pool",
+        action="store_true",
+        default=os.environ.get("CMD2TEX_POOL") == "1",
+        help="使用 cmd2tex-pool 守护进程中预热的登录shell执行命令，跳过登录初始化开销（守护进程不可用时回退到 script）",
+    )
+    parser.add_argument(
+        "--pool-socket",
+        default=default_socket_path(),
+        help="shell池套接字路径（默认: $CMD2TEX_POOL_SOCKET 或 $XDG_RUNTIME_DIR/cmd2tex-pool.sock）",
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="实时模式：执行期间由 log2tex --watch 持续更新输出LaTeX，便于实时预览PDF",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=2.0,
+        metavar="SECONDS",
+        help="实时模式下输出文件的最短更新间隔，单位秒（默认: 2）",
+    )
+    parser.add_argument(
+        "--timing",
+        action="store_true",
+        help="同时记录 script 时间文件 (.ansilog.timing)，供 log2tex 标注命令耗时",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=COMPRESSION_FORMATS,
+        default=os.environ.get("CMD2TEX_COMPRESS") or None,
+        help="边执行边压缩.ansilog文件（zst 需要安装 zstandard；默认: $CMD2TEX_COMPRESS，不压缩）",
+    )
+
+    # 资源限制
+    limit_group = parser.add_argument_group("resource limits")
+    limit_group.add_argument(
+        "--timeout",
+        type=float,
+        metavar="SECONDS",
+        help="整个会话的墙钟时间上限，超时后结束shell并在日志末尾注明",
+    )
+    limit_group.add_argument(
+        "--command-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="单个命令的墙钟时间上限，超时的命令被终止后继续执行后续命令",
+    )
+    limit_group.add_argument(
+        "--cpu-limit",
+        type=int,
+        metavar="SECONDS",
+        help="shell及其子进程的CPU时间上限（RLIMIT_CPU，按进程计算）",
+    )
+    limit_group.add_argument(
+        "--mem-limit",
+        type=int,
+        metavar="MB",
+        help="shell及其子进程的内存（地址空间）上限（RLIMIT_AS，按进程计算）",
+    )
+    limit_group.add_argument(
+        "--max-bytes",
+        type=int,
+        metavar="N",
+        help="最多记录N字节输出，超出部分只计数不记录，并在LaTeX中注明",
+    )
+    limit_group.add_argument(
+        "--max-lines",
+        type=int,
+        metavar="N",
+        help="最多记录N行输出，超出部分只计数不记录，并在LaTeX中注明",
+    )
 
     # 添加共同参数
     parser = add_common_args(parser)
 
     args = parser.parse_args()
 
+    # 环境变量提供的默认值不经过 choices 检查
+    if args.compress is not None and args.compress not in COMPRESSION_FORMATS:
+        parser.error(
+            f"invalid CMD2TEX_COMPRESS value: {args.compress!r} "
+            f"(choose from {', '.join(COMPRESSION_FORMATS)})"
+        )
+
     # 设置默认模式
     args = set_mode_defaults(args)
 
@@ -77,6 +175,18 @@ def main():
         print("  For log2tex: pip install --user .", file=sys.stderr)
         sys.exit(1)
 
+    if args.compress and not compression_available(args.compress):
+        print(
+            f"[cmd2tex] Error: {args.compress} compression requires the 'zstandard' package",
+            file=sys.stderr,
+        )
+        print("  Install: pip install --user zstandard", file=sys.stderr)
+        sys.exit(1)
+
+    if args.live and args.compress:
+        print("[cmd2tex] Error: --live cannot be used with --compress", file=sys.stderr)
+        sys.exit(1)
+
     # Validate input file exists
     if not os.path.exists(args.input):
         print(f"[cmd2tex] Error: input file not found: {args.input}", file=sys.stderr)
@@ -88,6 +198,8 @@ def main():
     # 修改log文件命名：使用输入文件basename + .ansilog
     input_base = os.path.splitext(args.input)[0]
     log_file = f"{input_base}.ansilog"
+    if args.compress:
+        log_file += COMPRESSION_SUFFIXES[args.compress]
 
     input_display = args.input
     output_display = args.output
@@ -95,41 +207,115 @@ def main():
     print(f"[cmd2tex] Input: {input_display}", file=sys.stderr)
     print(f"[cmd2tex] Output LaTeX: {output_display}", file=sys.stderr)
 
+    # log2tex 样式参数
+    style_args = ["--plain" if args.mode == "plain" else "--colored"]
+    style_args.extend(["--theme", args.theme])
+
     # Change to working directory if specified
     original_dir = os.getcwd()
+    watcher = None
     try:
-        # Step 1: Execute commands via script
+        # Step 1: Execute commands via script (or a warm shell from the pool)
         cmd_str = f'{args.shell} < "{commands_path}"'
-        print(f"[cmd2tex] Executing: script -c '{cmd_str}' {log_file}", file=sys.stderr)
+        pool_sock = None
+        if args.pool:
+            try:
+                pool_sock = connect_pool(args.pool_socket)
+            except OSError as e:
+                print(
+                    f"[cmd2tex] Warning: shell pool unavailable ({e}), using script",
+                    file=sys.stderr,
+                )
+        if pool_sock is not None:
+            print(
+                f"[cmd2tex] Executing: {cmd_str} via shell pool {args.pool_socket}",
+                file=sys.stderr,
+            )
+        else:
+            print(
+                f"[cmd2tex] Executing: script -c '{cmd_str}' {log_file}",
+                file=sys.stderr,
+            )
         print("-" * 60, file=sys.stderr)
 
+        if args.live:
+            # 实时模式：后台 log2tex 跟踪日志并持续更新输出
+            if os.path.exists(log_file):
+                os.remove(log_file)
+            watcher = subprocess.Popen(
+                ["log2tex", "-i", log_file, "-o", output_file, "--watch"]
+                + ["--interval", str(args.interval)]
+                + style_args
+            )
+
         # Execute via script command, output to log file, always show real-time output
-        proc = subprocess.run(
-            ["script", "-c", cmd_str, log_file], text=True, stdout=None, stderr=None
+        timing_file = timing_path(log_file) if args.timing else None
+        limits = CaptureLimits(
+            timeout=args.timeout,
+            command_timeout=args.command_timeout,
+            cpu_limit=args.cpu_limit,
+            mem_limit=args.mem_limit,
+            max_bytes=args.max_bytes,
+            max_lines=args.max_lines,
         )
+        returncode = None
+        if pool_sock is not None:
+            try:
+                returncode = run_pooled(
+                    pool_sock,
+                    args.shell,
+                    commands_path,
+                    log_file,
+                    compress=args.compress,
+                    timing_file=timing_file,
+                    flush=args.live,
+                    limits=limits,
+                )
+            except RuntimeError as e:
+                # 命令尚未执行（如 shell 无法切换到当前目录）
+                print(
+                    f"[cmd2tex] Warning: shell pool failed ({e}), using script",
+                    file=sys.stderr,
+                )
+        if returncode is None:
+            returncode = run_script(
+                cmd_str,
+                log_file,
+                compress=args.compress,
+                timing_file=timing_file,
+                flush=args.live,
+                limits=limits,
+                shell_argv=shlex.split(args.shell),
+            )
+
+        if watcher is not None:
+            watcher.terminate()
+            watcher.wait()
+            watcher = None
 
         print("-" * 60, file=sys.stderr)
 
-        if proc.returncode != 0:
+        if returncode != 0:
             print(
-                f"[cmd2tex] Warning: command exited with code {proc.returncode}",
+                f"[cmd2tex] Warning: command exited with code {returncode}",
                 file=sys.stderr,
             )
             # Continue to conversion even if commands failed
 
         print("[cmd2tex] Command execution completed.", file=sys.stderr)
 
+        if args.index and not args.no_log:
+            index = build_index(log_file)
+            print(
+                f"[cmd2tex] Log index created: {index_path(log_file)} "
+                f"({index.line_count} lines, {len(index.commands)} commands)",
+                file=sys.stderr,
+            )
+
         # Step 2: Convert log to LaTeX via log2tex
         print(f"[cmd2tex] Converting log to LaTeX...", file=sys.stderr)
 
-        log2tex_cmd = ["log2tex", "-i", log_file, "-o", output_file]
-
-        # 根据参数添加选项
-        if args.mode == "plain":
-            log2tex_cmd.append("--plain")
-        else:
-            log2tex_cmd.append("--colored")
-        log2tex_cmd.extend(["--theme", args.theme])
+        log2tex_cmd = ["log2tex", "-i", log_file, "-o", output_file] + style_args
 
         # Set environment variables for log2tex
         env = os.environ.copy()
@@ -148,6 +334,8 @@ def main():
         # Clean up intermediate log file (unless --no-log is specified)
         if os.path.exists(log_file) and args.no_log:
             os.remove(log_file)
+            if timing_file and os.path.exists(timing_file):
+                os.remove(timing_file)
             print(
                 f"[cmd2tex] Cleaned up intermediate log file: {log_file}",
                 file=sys.stderr,
@@ -158,6 +346,10 @@ def main():
         print("[cmd2tex] Conversion completed successfully.", file=sys.stderr)
 
     finally:
+        if watcher is not None:
+            watcher.terminate()
+            watcher.wait()
+
         # Restore original directory
         os.chdir(original_dir)
 
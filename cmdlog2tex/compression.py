@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compression Module for cmdlog2tex
+
+Transparent streaming (de)compression of ``.ansilog`` files. Input formats
+are detected by magic bytes: gzip, bz2 and xz come from the standard
+library, zstd is available when the optional ``zstandard`` package is
+installed.
+"""
+
+import bz2
+import gzip
+import lzma
+import re
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+# 魔数 -> 压缩格式
+# bz2 的 "BZh" 是可打印文本，需连同块大小与首个块（或空流结束标记）的魔数一起匹配
+MAGIC_NUMBERS = [
+    (re.compile(rb"\x1f\x8b"), "gz"),
+    (re.compile(rb"BZh[1-9](?:1AY&SY|\x17rE8P\x90)"), "bz2"),
+    (re.compile(rb"\xfd7zXZ\x00"), "xz"),
+    (re.compile(rb"\x28\xb5\x2f\xfd"), "zst"),
+]
+
+# 压缩格式 -> 文件后缀
+COMPRESSION_SUFFIXES = {
+    "gz": ".gz",
+    "bz2": ".bz2",
+    "xz": ".xz",
+    "zst": ".zst",
+}
+
+COMPRESSION_FORMATS = sorted(COMPRESSION_SUFFIXES)
+
+
+def detect_compression(path):
+    """
+    根据魔数检测文件的压缩格式
+
+    Returns:
+        str: 'gz' / 'bz2' / 'xz' / 'zst'，未压缩时返回 None
+    """
+    with open(path, "rb") as f:
+        head = f.read(16)
+    for magic, fmt in MAGIC_NUMBERS:
+        if magic.match(head):
+            return fmt
+    return None
+
+
+def compression_available(fmt):
+    """检查压缩格式是否可用（zst 依赖可选的 zstandard 包）"""
+    return fmt != "zst" or zstandard is not None
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise RuntimeError(
+            "zstd support requires the 'zstandard' package (pip install zstandard)"
+        )
+
+
+def open_log(path):
+    """
+    以二进制流方式打开日志文件，压缩文件自动流式解压
+
+    Returns:
+        file object: 可读的二进制文件对象（支持 with 语句）
+    """
+    fmt = detect_compression(path)
+    if fmt is None:
+        return open(path, "rb")
+    if fmt == "gz":
+        return gzip.open(path, "rb")
+    if fmt == "bz2":
+        return bz2.open(path, "rb")
+    if fmt == "xz":
+        return lzma.open(path, "rb")
+    _require_zstandard()
+    return zstandard.open(path, "rb")
+
+
+def open_log_writer(path, fmt=None):
+    """
+    以二进制流方式打开日志文件用于写入，可选边写边压缩
+
+    Args:
+        path: 输出文件路径
+        fmt: 压缩格式（None 表示不压缩）
+
+    Returns:
+        file object: 可写的二进制文件对象（支持 with 语句）
+    """
+    if fmt is None:
+        return open(path, "wb")
+    if fmt == "gz":
+        return gzip.open(path, "wb", compresslevel=6)
+    if fmt == "bz2":
+        return bz2.open(path, "wb")
+    if fmt == "xz":
+        return lzma.open(path, "wb", preset=3)
+    if fmt == "zst":
+        _require_zstandard()
+        return zstandard.open(path, "wb")
+    raise ValueError(f"unsupported compression format: {fmt}")
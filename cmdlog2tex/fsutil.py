@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+File System Utilities for cmdlog2tex
+
+Write helpers that leave byte-identical destinations untouched, so that
+latexmk/Make do not see spurious timestamp changes.
+"""
+
+import os
+import stat
+import tempfile
+
+
+def file_matches(path, data):
+    """判断 path 的内容是否与 data（bytes）完全一致"""
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def _target_mode(path):
+    """新文件的权限：沿用已有目标文件的权限，否则按 umask 计算"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def replace_file(path, data):
+    """
+    通过临时文件 + 重命名替换文件内容
+
+    不会原地修改目标文件，因此不会影响与之硬链接的缓存条目。
+    """
+    dirname = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=dirname, prefix=".tmp-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, _target_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_if_changed(path, data):
+    """
+    仅在内容变化时写入文件
+
+    Args:
+        path: 目标文件路径
+        data: 要写入的内容（bytes）
+
+    Returns:
+        bool: 是否实际写入
+    """
+    if file_matches(path, data):
+        return False
+    replace_file(path, data)
+    return True
+
+
+def copy_if_changed(src, dst):
+    """仅在目标文件缺失或内容不同时复制，返回是否实际复制"""
+    with open(src, "rb") as f:
+        data = f.read()
+    return write_if_changed(dst, data)
@@ -5,31 +5,83 @@ log2tex - Log to LaTeX Converter
 Convert terminal logs (with ANSI colors) to LaTeX documents.
 """
 
+import io
+import lzma
 import re
 import argparse
 import os
+import signal
 import sys
-import shutil
 import logging
+import time
 from .latex_template import LATEX_DOCUMENT_TEMPLATE
+from .compression import detect_compression, open_log
+from .ansindex import SGR_PATTERN, load_index
+from .textwidth import parse_header_columns, prewrap
+from .timing import (
+    annotate,
+    command_text,
+    command_times,
+    load_timeline,
+    timing_path,
+)
+from .cache import ConversionCache, DEFAULT_CACHE_SIZE_MB
+from .fsutil import write_if_changed, copy_if_changed
 from . import add_common_args, set_mode_defaults
 
 
+# 常见 bash 彩色提示符（Debian/Ubuntu 默认 PS1）：
+#   \x1b[01;32muser@host\x1b[00m:\x1b[01;34mpath\x1b[00m$
+# 有色模式下整体替换为 terminalboxes.sty 中的 \termprompt{user@host}{path}
+PROMPT_PATTERN = re.compile(
+    r"\x1b\[01;32m([^\x1b\n]+@[^\x1b\n]+)\x1b\[0?0m:"
+    r"\x1b\[01;34m([^\x1b\n]+)\x1b\[0?0m\$ "
+)
+PROMPT_PLACEHOLDER = re.compile(r"\x00(\d+)\x00")
+
+# 光标移动序列（及其尚未读完的前缀）：监视模式不在其前面的换行处分段
+CURSOR_MOVE_PATTERN = re.compile(rb"\x1b\[[0-9]*[ABCDEFGHJK]")
+CURSOR_MOVE_PREFIX = re.compile(rb"\x1b(?:\[[0-9]*)?\Z")
+
+
 class LogToTexConverter:
     """Convert terminal logs or HTML to LaTeX with terminal styling."""
 
-    def __init__(self, mode="plain", theme="dark"):
+    def __init__(self, mode="plain", theme="dark", prompt_macro=True, columns=None):
         """
         初始化转换器
 
         Args:
             mode: 'plain' (无色，默认) 或 'colored' (有色)
             theme: 'dark' (默认) 或 'light'
+            prompt_macro: 有色模式下是否将shell提示符输出为 \termprompt 宏
+            columns: 终端列数，设置后按终端宽度预先折行（None 或 0 表示不折行）
         """
         self.mode = mode
         self.theme = theme
+        self.prompt_macro = prompt_macro
+        self.columns = columns
         self.used_colors = set()
 
+    def extract_prompts(self, text):
+        """
+        将提示符替换为占位符，避免对其重复转义和着色
+
+        Returns:
+            tuple: (替换后的文本, 各占位符对应的 \termprompt 命令列表)
+        """
+        prompts = []
+
+        def replace(match):
+            user_host = self.escape_latex_special_chars(match.group(1))
+            path = self.escape_latex_special_chars(match.group(2))
+            prompts.append(f"\\termprompt{{{user_host}}}{{{path}}}")
+            # 先复位样式，使占位符不落在任何颜色命令之内
+            return f"\x1b[0m\x00{len(prompts) - 1}\x00"
+
+        text = PROMPT_PATTERN.sub(replace, text.replace("\x00", ""))
+        return text, prompts
+
     def strip_all_ansi_codes(self, text):
         """
         完全移除所有ANSI转义序列（包括SGR颜色序列）
@@ -154,11 +206,24 @@ class LogToTexConverter:
 
         return styles
 
-    def log_to_colored_latex(self, log_content):
-        """Convert ANSI log to colored LaTeX content."""
+    def log_to_colored_latex(self, log_content, trim=True):
+        """
+        Convert ANSI log to colored LaTeX content.
+
+        Args:
+            log_content: 原始日志内容
+            trim: 是否移除前后的空行（增量转换片段时应保留）
+        """
         # 清理不需要的ANSI序列（保留SGR用于颜色转换）
         cleaned = self.strip_ansi_except_sgr(log_content)
 
+        # 按终端宽度预先折行，输出显式换行
+        cleaned = prewrap(cleaned, self.columns)
+
+        prompts = []
+        if self.prompt_macro:
+            cleaned, prompts = self.extract_prompts(cleaned)
+
         # Debug模式: 保存清理后的log
         if os.environ.get("LOG2TEX_DEBUG"):
             debug_file = "debug_cleaned.log"
@@ -216,6 +281,10 @@ class LogToTexConverter:
             parts.append("}")
 
         latex_content = "".join(parts)
+        if prompts:
+            latex_content = PROMPT_PLACEHOLDER.sub(
+                lambda m: prompts[int(m.group(1))], latex_content
+            )
 
         # 转换换行符为LaTeX换行
         lines = latex_content.split("\n")
@@ -228,10 +297,11 @@ class LogToTexConverter:
                 processed.append("")
 
         # 移除前后的空行
-        while processed and not processed[0]:
-            processed.pop(0)
-        while processed and not processed[-1]:
-            processed.pop()
+        if trim:
+            while processed and not processed[0]:
+                processed.pop(0)
+            while processed and not processed[-1]:
+                processed.pop()
 
         return "\n".join(processed)
 
@@ -334,6 +404,9 @@ class LogToTexConverter:
         # 完全去除ANSI码
         clean_content = self.strip_all_ansi_codes(log_content)
 
+        # 按终端宽度预先折行
+        clean_content = prewrap(clean_content, self.columns)
+
         return clean_content
 
     def css_color_to_latex(self, css_color):
@@ -403,8 +476,9 @@ class LogToTexConverter:
         if not self.used_colors:
             return ""
 
+        # 按颜色名排序，保证多次运行输出逐字节一致
         lines = ["% Auto-generated color definitions"]
-        for name, r, g, b in self.used_colors:
+        for name, r, g, b in sorted(self.used_colors):
             lines.append(f"\\definecolor{{{name}}}{{rgb}}{{{r:.3f},{g:.3f},{b:.3f}}}")
         return "\n".join(lines) + "\n"
 
@@ -434,6 +508,104 @@ class LogToTexConverter:
         )
 
 
+def parse_line_range(spec):
+    """
+    解析 --lines 参数
+
+    Returns:
+        tuple: (起始行, 结束行)，0起、左闭右开；结束行 None 表示到文件末尾
+    """
+    match = re.match(r"^(\d*):(\d*)$", spec)
+    if not match:
+        raise argparse.ArgumentTypeError(f"无效的行范围: {spec}（格式: START:END）")
+    start = int(match.group(1)) if match.group(1) else 1
+    end = int(match.group(2)) if match.group(2) else None
+    if start < 1 or (end is not None and end < start):
+        raise argparse.ArgumentTypeError(f"无效的行范围: {spec}")
+    return start - 1, end
+
+
+def read_header_columns(path):
+    """读取日志 script 头部记录的终端宽度（COLUMNS），未记录时返回 None"""
+    with open_log(path) as f:
+        return parse_header_columns(f.readline(4096))
+
+
+def resolve_timing_file(args):
+    """确定时间文件：--timing 指定，或需要计时功能时使用 <输入>.timing"""
+    if args.timing:
+        if not os.path.exists(args.timing):
+            raise ValueError(f"未找到时间文件: {args.timing}")
+        return args.timing
+    if args.time_margin or args.slow is not None or args.slowest:
+        path = timing_path(args.input)
+        if not os.path.exists(path):
+            raise ValueError(f"未找到时间文件: {path}（可用 --timing 指定）")
+        return path
+    return None
+
+
+def print_slowest(f, index, times, count):
+    """在 stderr 输出耗时最长的 count 个命令"""
+    ranked = sorted(times, key=lambda item: item[3], reverse=True)[:count]
+    print(f"[log2tex] 耗时最长的 {len(ranked)} 个命令:", file=sys.stderr)
+    for number, line, started, elapsed in ranked:
+        text = command_text(f, index, line)
+        print(
+            f"  #{number:<4} {elapsed:9.2f}s  (+{started:.2f}s, 第 {line + 1} 行)  {text}",
+            file=sys.stderr,
+        )
+
+
+def read_input(args):
+    """
+    读取输入日志的原始字节
+
+    指定 --lines/--command 时只读取对应切片；提供时间文件时按需插入时间注释。
+    """
+    timing_file = resolve_timing_file(args)
+    if args.lines is None and args.command is None and timing_file is None:
+        with open_log(args.input) as f:
+            return f.read()
+
+    index = load_index(args.input)
+    if args.command is not None:
+        start, end = index.command_lines(args.command)
+        print(
+            f"[log2tex] 命令 {args.command}: 第 {start + 1}-{end} 行", file=sys.stderr
+        )
+    elif args.lines is not None:
+        start, end = args.lines
+        if end is None:
+            end = index.line_count
+    else:
+        start, end = 0, index.line_count
+    start, end = index.clamp(start, end)
+
+    with open_log(args.input) as f:
+        if timing_file is None:
+            return index.read_lines(f, start, end)
+
+        timeline = load_timeline(timing_file, index.header_length)
+        times = command_times(index, timeline)
+        print(
+            f"[log2tex] 时间文件: {timing_file}（总时长 {timeline.duration:.2f}s）",
+            file=sys.stderr,
+        )
+        if args.slowest:
+            print_slowest(f, index, times, args.slowest)
+
+        state = index.state_at(f, start)
+        data = index.read_lines(f, start, end, with_state=False)
+
+    data = annotate(
+        data, index, times, start, end, margin=args.time_margin, slow=args.slow
+    )
+    if state:
+        data = b"\x1b[" + state.encode("ascii") + b"m" + data
+    return data
+
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -441,67 +613,374 @@ def parse_args():
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""Environment Variables:
   LOG2TEX_MODE            - 默认模式: plain/colored (默认: colored)
-  LOG2TEX_THEME           - 默认主题: dark/light (默认: dark)""",
+  LOG2TEX_THEME           - 默认主题: dark/light (默认: dark)
+  LOG2TEX_CACHE_DIR       - 转换缓存目录（设置后启用缓存）
+  LOG2TEX_CACHE_SIZE      - 转换缓存大小上限，单位MB (默认: 256)""",
     )
 
-    parser.add_argument("--input", "-i", required=True, help="输入文件（日志，必需）")
+    parser.add_argument("--input", "-i", required=True, help="输入文件（日志，必需；支持 gzip/bz2/xz/zstd 压缩）")
     parser.add_argument("--output", "-o", required=True, help="输出LaTeX文件（必需）")
 
+    # 切片转换（借助 <输入>.idx 索引直接定位，索引缺失时自动构建）
+    slice_group = parser.add_mutually_exclusive_group()
+    slice_group.add_argument(
+        "--lines",
+        type=parse_line_range,
+        metavar="START:END",
+        help="仅转换指定行范围（1起，含两端；可省略任一端，如 100000:100500、:200）",
+    )
+    slice_group.add_argument(
+        "--command",
+        type=int,
+        metavar="N",
+        help="仅转换第N个命令（从其提示符行到下一个提示符之前，1起）",
+    )
+
+    # 计时信息（script -T 时间文件）
+    parser.add_argument(
+        "--timing",
+        metavar="FILE",
+        help="script 时间文件（默认: <输入>.timing，仅在使用计时功能时读取）",
+    )
+    parser.add_argument(
+        "--time-margin",
+        action="store_true",
+        help="在每个命令提示符前标注自会话开始以来的时间",
+    )
+    parser.add_argument(
+        "--slow",
+        type=float,
+        metavar="SECONDS",
+        help="耗时不少于SECONDS秒的命令在其输出后追加 [slow] 提示行",
+    )
+    parser.add_argument(
+        "--slowest",
+        type=int,
+        metavar="N",
+        help="在终端输出耗时最长的N个命令汇总",
+    )
+
+    parser.add_argument(
+        "--columns",
+        type=int,
+        metavar="N",
+        help="按N列终端宽度预先折行（默认: 读取 script 头部记录的 COLUMNS；0 表示不折行）",
+    )
+    parser.add_argument(
+        "--no-prompt-macro",
+        action="store_false",
+        dest="prompt_macro",
+        help="有色模式下不将shell提示符压缩为 \\termprompt 宏，逐字符输出颜色命令",
+    )
+
+    # 监视模式
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="监视模式：持续跟踪增长中的日志，只转换新追加的完整行并定期原子更新输出（Ctrl+C 或 SIGTERM 结束）",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=2.0,
+        metavar="SECONDS",
+        help="监视模式下输出文件的最短更新间隔，单位秒（默认: 2）",
+    )
+
+    # 转换缓存
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("LOG2TEX_CACHE_DIR"),
+        help="转换缓存目录：输入内容与选项未变化时直接复用缓存结果（默认: $LOG2TEX_CACHE_DIR，未设置则不启用）",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        help="转换缓存大小上限，单位MB，超出后按最近使用淘汰（默认: $LOG2TEX_CACHE_SIZE 或 256）",
+    )
+    parser.add_argument(
+        "--cache-link",
+        action="store_true",
+        help="缓存命中时使用硬链接代替复制（跨文件系统时自动回退为复制）",
+    )
+
     # 添加共同参数
     parser = add_common_args(parser)
 
     args = parser.parse_args()
 
+    # 环境变量提供的默认值在解析后校验，避免构建参数时直接抛出异常
+    if args.cache_size is None:
+        value = os.environ.get("LOG2TEX_CACHE_SIZE") or str(DEFAULT_CACHE_SIZE_MB)
+        try:
+            args.cache_size = int(value)
+        except ValueError:
+            parser.error(f"LOG2TEX_CACHE_SIZE 无效: {value!r}（应为以MB为单位的整数）")
+
+    if args.watch and (
+        args.lines is not None
+        or args.command is not None
+        or args.timing
+        or args.time_margin
+        or args.slow is not None
+        or args.slowest
+    ):
+        parser.error("--watch 不能与 --lines/--command 或计时选项同时使用")
+
     # 设置默认模式
     args = set_mode_defaults(args)
 
     return args
 
 
+def read_log(data):
+    """将日志原始字节解码为文本（UTF-8，忽略非法字节，通用换行）"""
+    with io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def convert_log(converter, input_content):
+    """按转换器模式将日志文本转换为完整LaTeX文档"""
+    if converter.mode == "plain":
+        # ===== 无色模式 =====
+        latex_content = converter.log_to_plain_latex(input_content)
+    else:
+        # ===== 有色模式 =====
+        latex_content = converter.log_to_colored_latex(input_content)
+    return converter.generate_latex_document(latex_content)
+
+
+def copy_style(output_dir):
+    """复制 terminalboxes.sty 到输出目录（内容未变化时跳过）"""
+    sty_src = os.path.join(os.path.dirname(__file__), "terminalboxes.sty")
+    sty_dst = os.path.join(output_dir, "terminalboxes.sty")
+    if os.path.exists(sty_src):
+        if copy_if_changed(sty_src, sty_dst):
+            print(f"[log2tex] 宏包已复制: {sty_dst}", file=sys.stderr)
+    else:
+        print(f"[log2tex] 警告: 未找到宏包文件: {sty_src}", file=sys.stderr)
+
+
+class _WatchStopped(Exception):
+    """监视模式收到结束信号"""
+
+
+def watch_log(args, converter, poll=0.2):
+    """
+    监视模式：跟踪增长中的日志并增量转换
+
+    每次只读取上次位置之后新追加的完整行，转换后追加到已有内容；
+    输出文件按 --interval 节流，通过临时文件原子替换。
+    收到 SIGTERM 或 Ctrl+C 时转换剩余内容（包括末尾不完整的行）后退出。
+
+    Args:
+        args: 命令行参数
+        converter: LogToTexConverter 实例
+        poll: 文件大小轮询间隔（秒）
+    """
+    output_dir = os.path.dirname(args.output) or "."
+    os.makedirs(output_dir, exist_ok=True)
+    copy_style(output_dir)
+
+    def stop(signum, frame):
+        raise _WatchStopped()
+
+    signal.signal(signal.SIGTERM, stop)
+
+    fragments = []
+    offset = 0
+    state = None
+    dirty = False
+    last_write = 0.0
+
+    def styled(params):
+        if params is None:
+            return False
+        return any(converter.parse_sgr(params.split(";") if params else ["0"]).values())
+
+    def redraw_follows(chunk, pos):
+        """pos 处是否是（或可能是尚未读完的）光标移动序列"""
+        return pos >= len(chunk) or bool(
+            CURSOR_MOVE_PATTERN.match(chunk, pos)
+            or CURSOR_MOVE_PREFIX.match(chunk, pos)
+        )
+
+    def safe_cut(chunk):
+        """
+        返回 chunk 中可作为分段边界的最后一个换行位置（不存在时返回 -1）
+
+        有色模式下只在无样式生效处分段：样式跨越分段边界时，分段转换会
+        提前关闭并重新打开样式组，与一次性转换的结果不一致。
+        其后紧跟光标移动序列（或尚无后续内容）的换行也不作为边界，
+        因为清除重绘行的规则需要同时看到换行与其后的序列。
+        """
+        if converter.mode == "plain":
+            spans = [(0, len(chunk))]
+        else:
+            spans = []
+            params = state
+            start = 0
+            for match in SGR_PATTERN.finditer(chunk):
+                if not styled(params):
+                    spans.append((start, match.start()))
+                params = match.group(1).decode("ascii")
+                start = match.end()
+            if not styled(params):
+                spans.append((start, len(chunk)))
+        for start, end in reversed(spans):
+            pos = chunk.rfind(b"\n", start, end)
+            while pos >= 0:
+                if not redraw_follows(chunk, pos + 1):
+                    return pos
+                pos = chunk.rfind(b"\n", start, pos)
+        return -1
+
+    def convert_chunk(chunk):
+        nonlocal state
+        if state:
+            chunk = b"\x1b[" + state.encode("ascii") + b"m" + chunk
+        match = None
+        for match in SGR_PATTERN.finditer(chunk):
+            pass
+        if match:
+            state = match.group(1).decode("ascii")
+        text = read_log(chunk)
+        if converter.mode == "plain":
+            return converter.log_to_plain_latex(text)
+        return converter.log_to_colored_latex(text, trim=False)
+
+    def flush():
+        content = "".join(fragments)
+        if converter.mode == "plain":
+            content = re.sub(r"\n\n\n+", "\n\n", content)
+        else:
+            content = content.strip("\n")
+        latex_doc = converter.generate_latex_document(content)
+        return write_if_changed(args.output, latex_doc.encode("utf-8"))
+
+    print(
+        f"[log2tex] 监视: {args.input}（更新间隔 {args.interval:g}s，Ctrl+C 结束）",
+        file=sys.stderr,
+    )
+    try:
+        while True:
+            try:
+                size = os.path.getsize(args.input)
+            except OSError:
+                size = 0
+            if size < offset:
+                # 日志被截断或替换：从头开始
+                print("[log2tex] 日志被截断，重新转换", file=sys.stderr)
+                fragments, offset, state = [], 0, None
+                converter.used_colors = set()
+            if size > offset:
+                with open(args.input, "rb") as f:
+                    f.seek(offset)
+                    chunk = f.read(size - offset)
+                if offset == 0 and converter.columns is None:
+                    converter.columns = parse_header_columns(chunk)
+                cut = safe_cut(chunk)
+                if cut >= 0:
+                    fragments.append(convert_chunk(chunk[: cut + 1]))
+                    offset += cut + 1
+                    dirty = True
+            now = time.monotonic()
+            if dirty and now - last_write >= args.interval:
+                flush()
+                dirty = False
+                last_write = now
+            time.sleep(poll)
+    except (KeyboardInterrupt, _WatchStopped):
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # 结束前转换剩余内容
+    if os.path.exists(args.input):
+        with open(args.input, "rb") as f:
+            f.seek(offset)
+            rest = f.read()
+        if rest:
+            fragments.append(convert_chunk(rest))
+    flush()
+    print(f"[log2tex] 输出已写入: {args.output}", file=sys.stderr)
+
+
 def main():
     """Main entry point."""
     args = parse_args()
 
-    converter = LogToTexConverter(mode=args.mode, theme=args.theme)
+    converter = LogToTexConverter(
+        mode=args.mode,
+        theme=args.theme,
+        prompt_macro=args.prompt_macro,
+        columns=args.columns,
+    )
 
     # Validate input file exists
-    if not os.path.exists(args.input):
+    if not os.path.exists(args.input) and not args.watch:
         print(f"[log2tex] 错误: 输入文件不存在: {args.input}", file=sys.stderr)
         sys.exit(1)
 
+    if args.watch:
+        if os.path.exists(args.input) and detect_compression(args.input):
+            print("[log2tex] 错误: 监视模式不支持压缩日志", file=sys.stderr)
+            sys.exit(1)
+        watch_log(args, converter)
+        return
+
     # Read input
     print(f"[log2tex] 读取: {args.input}", file=sys.stderr)
-    with open(args.input, "r", encoding="utf-8", errors="ignore") as f:
-        input_content = f.read()
-
-    # 根据模式处理
-    if args.mode == "plain":
-        # ===== 无色模式 =====
-        print(f"[log2tex] 无色模式 + {args.theme} 主题", file=sys.stderr)
-        latex_content = converter.log_to_plain_latex(input_content)
-    else:
-        # ===== 有色模式 =====
-        print(f"[log2tex] 有色模式 + {args.theme} 主题", file=sys.stderr)
-        latex_content = converter.log_to_colored_latex(input_content)
+    try:
+        if converter.columns is None:
+            converter.columns = read_header_columns(args.input)
+        if converter.columns:
+            print(f"[log2tex] 终端宽度: {converter.columns} 列", file=sys.stderr)
+        raw = read_input(args)
+    except (ValueError, RuntimeError, OSError, EOFError, lzma.LZMAError) as e:
+        # RuntimeError: 压缩格式不可用（如 zst 未安装 zstandard）
+        # OSError/EOFError/LZMAError: 压缩文件损坏或被截断（如采集中途被终止）
+        print(f"[log2tex] 错误: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    # 生成完整文档并输出
-    latex_doc = converter.generate_latex_document(latex_content)
     output_dir = os.path.dirname(args.output) or "."
     os.makedirs(output_dir, exist_ok=True)
-    
-    # 写入 LaTeX 文档
-    with open(args.output, "w", encoding="utf-8") as f:
-        f.write(latex_doc)
-    print(f"[log2tex] 输出已写入: {args.output}", file=sys.stderr)
 
-    # 复制 terminalboxes.sty 到输出目录
-    sty_src = os.path.join(os.path.dirname(__file__), "terminalboxes.sty")
-    sty_dst = os.path.join(output_dir, "terminalboxes.sty")
-    if os.path.exists(sty_src):
-        shutil.copy(sty_src, sty_dst)
-        print(f"[log2tex] 宏包已复制: {sty_dst}", file=sys.stderr)
+    cache = None
+    cache_key = None
+    if args.cache_dir:
+        cache = ConversionCache(args.cache_dir, args.cache_size * 1024 * 1024)
+        cache_key = cache.make_key(
+            raw,
+            {
+                "mode": args.mode,
+                "theme": args.theme,
+                "prompt_macro": args.prompt_macro,
+                "columns": converter.columns,
+            },
+        )
+
+    if cache is not None and cache.lookup(cache_key):
+        # 缓存命中：跳过解析，直接输出缓存结果
+        print(f"[log2tex] 缓存命中: {cache_key[:12]}", file=sys.stderr)
+        written = cache.materialize(cache_key, args.output, link=args.cache_link)
     else:
-        print(f"[log2tex] 警告: 未找到宏包文件: {sty_src}", file=sys.stderr)
+        mode_name = "无色模式" if args.mode == "plain" else "有色模式"
+        print(f"[log2tex] {mode_name} + {args.theme} 主题", file=sys.stderr)
+        latex_doc = convert_log(converter, read_log(raw)).encode("utf-8")
+        if cache is not None:
+            cache.store(cache_key, latex_doc)
+
+        # 写入 LaTeX 文档（内容未变化时保留原文件及其时间戳）
+        written = write_if_changed(args.output, latex_doc)
+
+    if written:
+        print(f"[log2tex] 输出已写入: {args.output}", file=sys.stderr)
+    else:
+        print(f"[log2tex] 输出未变化: {args.output}", file=sys.stderr)
+
+    # 复制 terminalboxes.sty 到输出目录
+    copy_style(output_dir)
 
 
 if __name__ == "__main__":
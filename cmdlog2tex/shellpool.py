@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+"""
+cmd2tex-pool - Warm Shell Pool for cmd2tex
+
+A local daemon that keeps pre-initialized login shells (profile and conda
+init already sourced) waiting on their own pseudo-terminals. Each cmd2tex
+run started with ``--pool`` takes one of them over a Unix socket instead of
+paying the login cost itself.
+
+Shells are single-use: after the reset to the client's working directory
+the run's commands are fed to the shell, its output is streamed back, and
+the shell exits at end of input. A replacement is started in the background
+from the environment snapshot taken when the daemon started, so runs never
+see each other's state.
+
+Protocol (frames of 1-byte kind + 4-byte big-endian length + payload)::
+
+    client -> daemon   R  JSON request (shell, cwd, columns, lines, limits)
+                       C  commands to execute
+    daemon -> client   O  terminal output
+                       X  JSON result (returncode, notes, warm)
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import pty
+import queue
+import shlex
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import termios
+import threading
+import time
+from datetime import datetime
+
+from .ansindex import ANSI_PATTERN
+from .capture import (
+    CaptureLimits,
+    CommandWatchdog,
+    LogSink,
+    descendants,
+    kill_tree,
+    write_notes,
+)
+
+READY_MARKER = b"\x1b]777;cmd2tex-ready\x07"
+FAILED_MARKER = b"\x1b]777;cmd2tex-failed\x07"
+READY_TIMEOUT = 120.0
+DEFAULT_POOL_SIZE = 2
+
+
+def default_socket_path():
+    """获取默认套接字路径（$CMD2TEX_POOL_SOCKET，或运行时目录下的 cmd2tex-pool.sock）"""
+    path = os.environ.get("CMD2TEX_POOL_SOCKET")
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "cmd2tex-pool.sock")
+    return os.path.join("/tmp", f"cmd2tex-pool-{os.getuid()}.sock")
+
+
+def peer_uid(sock):
+    """返回 Unix 套接字对端进程的 uid（平台不支持 SO_PEERCRED 时返回 None）"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+def send_frame(sock, kind, payload):
+    """发送一帧数据"""
+    sock.sendall(kind + struct.pack(">I", len(payload)) + payload)
+
+
+def recv_frame(f):
+    """从套接字文件对象读取一帧，连接关闭时返回 (None, None)"""
+    header = f.read(5)
+    if len(header) < 5:
+        return None, None
+    (length,) = struct.unpack(">I", header[1:])
+    payload = f.read(length)
+    if len(payload) < length:
+        return None, None
+    return header[:1], payload
+
+
+# ============================================================================
+# 守护进程
+# ============================================================================
+
+
+class WarmShell:
+    """A login shell waiting on its own pty, stdin fed from a pipe."""
+
+    def __init__(self, shell, env):
+        """
+        启动 shell，初始化（登录脚本等）在后台进行
+
+        Args:
+            shell: shell 命令字符串（如 bash --login -i）
+            env: 启动 shell 使用的环境变量快照
+        """
+        self.shell = shell
+        self.argv = shlex.split(shell)
+        self.master, slave = pty.openpty()
+
+        def make_controlling_tty():
+            fcntl.ioctl(1, termios.TIOCSCTTY, 0)
+
+        # 与 cmd2tex 的 `shell < 命令文件` 一致：stdin 为管道，输出到终端
+        self.proc = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=slave,
+            stderr=slave,
+            env=env,
+            cwd=os.path.expanduser("~"),
+            start_new_session=True,
+            preexec_fn=make_controlling_tty,
+        )
+        os.close(slave)
+        self.output = queue.Queue()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            try:
+                chunk = os.read(self.master, 65536)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                self.output.put(None)
+                return
+            self.output.put(chunk)
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None
+
+    def set_window_size(self, columns, lines):
+        fcntl.ioctl(
+            self.master, termios.TIOCSWINSZ, struct.pack("HHHH", lines, columns, 0, 0)
+        )
+
+    def wait_ready(self, cwd, timeout=READY_TIMEOUT):
+        """
+        重置工作目录与历史，并丢弃此前的全部输出（登录信息、初始提示符等）
+
+        重置失败（如工作目录不存在）时抛出 RuntimeError，此时不得再输入命令。
+
+        Returns:
+            bytes: 就绪标记之后已收到的输出（新的提示符）
+        """
+        reset = (
+            f"cd -- {shlex.quote(cwd)} && {{ history -c 2>/dev/null; "
+            f"printf '\\033]777;cmd2tex-ready\\007'; }} "
+            f"|| printf '\\033]777;cmd2tex-failed\\007'\n"
+        )
+        self.proc.stdin.write(reset.encode("utf-8"))
+        self.proc.stdin.flush()
+
+        buffered = b""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("shell did not become ready in time")
+            try:
+                chunk = self.output.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if chunk is None:
+                raise RuntimeError("shell exited during initialization")
+            buffered += chunk
+            pos = buffered.find(FAILED_MARKER)
+            if pos >= 0:
+                # 保留 shell 的报错（如 cd 的错误信息），丢弃登录信息等
+                lines = ANSI_PATTERN.sub(b"", buffered[:pos]).splitlines()
+                lines = [line.strip() for line in lines if line.strip()]
+                reason = lines[-1].decode("utf-8", "replace") if lines else "failed"
+                raise RuntimeError(f"cannot reset shell to {cwd}: {reason}")
+            pos = buffered.find(READY_MARKER)
+            if pos >= 0:
+                return buffered[pos + len(READY_MARKER) :]
+
+    def close(self):
+        if self.alive:
+            kill_tree(descendants(self.proc.pid)[::-1] + [self.proc.pid])
+        self.proc.wait()
+        try:
+            os.close(self.master)
+        except OSError:
+            pass
+
+
+class ShellPool:
+    """Pool of warm shells for one shell command."""
+
+    def __init__(self, shell, size=DEFAULT_POOL_SIZE):
+        """
+        Args:
+            shell: shell 命令字符串
+            size: 保持预热的 shell 数量
+        """
+        self.shell = shell
+        self.size = size
+        # 环境变量快照：所有 shell 都从守护进程启动时的环境创建
+        self.env = dict(os.environ)
+        self._shells = []
+        self._lock = threading.Lock()
+        self.refill()
+
+    def refill(self):
+        """补足预热的 shell"""
+        with self._lock:
+            self._shells = [s for s in self._shells if s.alive]
+            while len(self._shells) < self.size:
+                self._shells.append(WarmShell(self.shell, self.env))
+
+    def acquire(self, shell):
+        """
+        取出一个 shell，并在后台补充新的预热 shell
+
+        Returns:
+            tuple: (WarmShell, 是否为预热的 shell)
+        """
+        if shell != self.shell:
+            return WarmShell(shell, self.env), False
+        with self._lock:
+            warm = None
+            while self._shells and warm is None:
+                candidate = self._shells.pop(0)
+                if candidate.alive:
+                    warm = candidate
+                else:
+                    candidate.close()
+        threading.Thread(target=self.refill, daemon=True).start()
+        if warm is None:
+            return WarmShell(shell, self.env), False
+        return warm, True
+
+    def close(self):
+        with self._lock:
+            for shell in self._shells:
+                shell.close()
+            self._shells = []
+
+
+def handle_client(conn, pool):
+    """处理一次 cmd2tex 运行请求"""
+    rfile = conn.makefile("rb")
+    kind, payload = recv_frame(rfile)
+    if kind != b"R":
+        return
+    request = json.loads(payload.decode("utf-8"))
+    kind, commands = recv_frame(rfile)
+    if kind != b"C":
+        return
+
+    shell, warm = pool.acquire(request["shell"])
+    limits = CaptureLimits(**request.get("limits", {}))
+    notes = []
+    watchdog = None
+    timer = None
+    print(
+        f"[cmd2tex-pool] Run in {request['cwd']} "
+        f"({'warm' if warm else 'cold'} shell, pid {shell.proc.pid})",
+        file=sys.stderr,
+    )
+    try:
+        shell.set_window_size(request.get("columns", 80), request.get("lines", 24))
+        pending = shell.wait_ready(request["cwd"])
+        limits.apply_rlimits(shell.proc.pid)
+        if limits.command_timeout:
+            watchdog = CommandWatchdog(
+                shell.proc.pid, shell.argv, limits.command_timeout, notes
+            )
+            watchdog.start()
+        if limits.timeout:
+
+            def expire():
+                notes.append(f"session killed after {limits.timeout:g}s timeout")
+                kill_tree(descendants(shell.proc.pid)[::-1] + [shell.proc.pid])
+
+            timer = threading.Timer(limits.timeout, expire)
+            timer.daemon = True
+            timer.start()
+
+        # 输入命令后关闭 stdin，shell 执行完毕后随即退出
+        shell.proc.stdin.write(commands)
+        shell.proc.stdin.close()
+
+        if pending:
+            send_frame(conn, b"O", pending)
+        while True:
+            chunk = shell.output.get()
+            if chunk is None:
+                break
+            send_frame(conn, b"O", chunk)
+        returncode = shell.proc.wait()
+        result = {"returncode": returncode, "notes": notes, "warm": warm}
+    except (OSError, RuntimeError) as e:
+        result = {"returncode": 1, "notes": notes, "warm": warm, "error": str(e)}
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if watchdog is not None:
+            watchdog.stop()
+        shell.close()
+    try:
+        send_frame(conn, b"X", json.dumps(result).encode("utf-8"))
+    except OSError:
+        pass
+
+
+def serve(socket_path, shell, size=DEFAULT_POOL_SIZE):
+    """
+    运行守护进程，直到收到 SIGTERM 或 Ctrl+C
+
+    Args:
+        socket_path: Unix 套接字路径
+        shell: 预热的 shell 命令字符串
+        size: 保持预热的 shell 数量
+    """
+    if os.path.exists(socket_path):
+        # 已有守护进程在运行时不覆盖其套接字
+        try:
+            socket.socket(socket.AF_UNIX).connect(socket_path)
+        except OSError:
+            os.remove(socket_path)
+        else:
+            raise RuntimeError(f"pool already running on {socket_path}")
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o077)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(16)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+
+    pool = ShellPool(shell, size)
+    print(
+        f"[cmd2tex-pool] Serving {size} warm '{shell}' shells on {socket_path}",
+        file=sys.stderr,
+    )
+    try:
+        while True:
+            conn, _ = server.accept()
+            if peer_uid(conn) not in (None, os.getuid()):
+                # 只为同一用户的 cmd2tex 执行命令
+                conn.close()
+                continue
+            thread = threading.Thread(
+                target=_serve_connection, args=(conn, pool), daemon=True
+            )
+            thread.start()
+    except KeyboardInterrupt:
+        print("\n[cmd2tex-pool] Shutting down.", file=sys.stderr)
+    finally:
+        server.close()
+        pool.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def _serve_connection(conn, pool):
+    try:
+        handle_client(conn, pool)
+    except Exception as e:
+        print(f"[cmd2tex-pool] Error: {e}", file=sys.stderr)
+    finally:
+        conn.close()
+
+
+# ============================================================================
+# 客户端（cmd2tex --pool）
+# ============================================================================
+
+
+def connect_pool(socket_path):
+    """
+    连接守护进程，失败时抛出 OSError
+
+    监听端必须属于当前用户：默认套接字路径可能位于共享的 /tmp，
+    其他用户可抢先绑定该路径以窃取命令或伪造输出。
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        uid = peer_uid(sock)
+        if uid is None:
+            uid = os.stat(socket_path).st_uid
+        if uid != os.getuid():
+            raise PermissionError(
+                f"pool socket {socket_path} is served by uid {uid}, not {os.getuid()}"
+            )
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _timestamp():
+    return datetime.now().astimezone().isoformat(sep=" ", timespec="seconds")
+
+
+def run_pooled(
+    sock,
+    shell,
+    commands_path,
+    log_file,
+    compress=None,
+    timing_file=None,
+    flush=False,
+    limits=None,
+):
+    """
+    在守护进程提供的预热 shell 中执行命令，并写出与 script 格式一致的日志
+
+    Args:
+        sock: connect_pool() 返回的连接
+        shell: shell 命令字符串
+        commands_path: 命令文件路径
+        log_file: 日志文件路径
+        compress: 压缩格式（None 表示不压缩）
+        timing_file: 时间文件路径（classic 格式），None 表示不记录
+        flush: 是否每次输出后立即刷新日志文件
+        limits: CaptureLimits，None 表示不限制
+
+    Returns:
+        int: shell 的退出码
+
+    Raises:
+        RuntimeError: 守护进程未能启动本次运行（命令尚未执行），调用方应回退到 script
+    """
+    limits = limits or CaptureLimits()
+    with open(commands_path, "rb") as f:
+        commands = f.read()
+    size = shutil.get_terminal_size()
+    request = {
+        "shell": shell,
+        "cwd": os.getcwd(),
+        "columns": size.columns,
+        "lines": size.lines,
+        "limits": {
+            "timeout": limits.timeout,
+            "command_timeout": limits.command_timeout,
+            "cpu_limit": limits.cpu_limit,
+            "mem_limit": limits.mem_limit,
+        },
+    }
+
+    command_desc = f'{shell} < "{commands_path}"'
+    if sys.stdout.isatty():
+        term = os.environ.get("TERM", "dumb")
+        header_info = (
+            f'TERM="{term}" TTY="{os.ttyname(1)}" '
+            f'COLUMNS="{size.columns}" LINES="{size.lines}"'
+        )
+    else:
+        header_info = f'COMMAND="{command_desc}" <not executed on terminal>'
+
+    sink = LogSink(
+        log_file,
+        compress,
+        max_bytes=limits.max_bytes,
+        max_lines=limits.max_lines,
+        flush=flush,
+    )
+    timing = open(timing_file, "w") if timing_file else None
+    result = {"returncode": 1, "notes": ["connection to shell pool lost"]}
+    try:
+        # 头部行不受输出上限约束，也不计入时间文件（与 script 一致）
+        sink.write_note(f"Script started on {_timestamp()} [{header_info}]\n")
+        send_frame(sock, b"R", json.dumps(request).encode("utf-8"))
+        send_frame(sock, b"C", commands)
+
+        rfile = sock.makefile("rb")
+        last = time.monotonic()
+        received = False
+        while True:
+            kind, payload = recv_frame(rfile)
+            if kind is None:
+                break
+            if kind == b"O":
+                now = time.monotonic()
+                if timing is not None:
+                    timing.write(f"{now - last:.6f} {len(payload)}\n")
+                last = now
+                received = True
+                sink.write(payload)
+                sys.stdout.buffer.write(payload)
+                sys.stdout.buffer.flush()
+            elif kind == b"X":
+                result = json.loads(payload.decode("utf-8"))
+                break
+
+        if result.get("error"):
+            if not received:
+                raise RuntimeError(result["error"])
+            print(f"[cmd2tex] Warning: shell pool: {result['error']}", file=sys.stderr)
+        notes = list(result.get("notes", []))
+        for note in notes:
+            print(f"[cmd2tex] Warning: {note}", file=sys.stderr)
+        sink.write_note(
+            f'\nScript done on {_timestamp()} '
+            f'[COMMAND_EXIT_CODE="{result["returncode"]}"]\n'
+        )
+        if sink.truncated:
+            note = sink.truncation_note()
+            print(f"[cmd2tex] Warning: {note}", file=sys.stderr)
+            notes.append(note)
+        write_notes(log_file, notes, sink)
+    finally:
+        sock.close()
+        sink.close()
+        if timing is not None:
+            timing.close()
+    return result["returncode"]
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Keep warm login shells for cmd2tex --pool.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Environment Variables:
+  CMD2TEX_SHELL        - Shell to keep warm (default: bash --login -i)
+  CMD2TEX_POOL_SOCKET  - Socket path (default: $XDG_RUNTIME_DIR/cmd2tex-pool.sock)""",
+    )
+    parser.add_argument(
+        "--shell",
+        default=os.environ.get("CMD2TEX_SHELL", "bash --login -i"),
+        help="Shell to keep warm (default: bash --login -i or $CMD2TEX_SHELL)",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help=f"预热的 shell 数量（默认: {DEFAULT_POOL_SIZE}）",
+    )
+    parser.add_argument(
+        "--socket",
+        default=default_socket_path(),
+        help="Unix 套接字路径（默认: $CMD2TEX_POOL_SOCKET 或 $XDG_RUNTIME_DIR/cmd2tex-pool.sock）",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point."""
+    args = parse_args()
+    serve(args.socket, args.shell, max(1, args.size))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[cmd2tex-pool] Interrupted by user.", file=sys.stderr)
+        sys.exit(130)
+    except Exception as e:
+        print(f"[cmd2tex-pool] Error: {e}", file=sys.stderr)
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Text Width Module for cmdlog2tex
+
+Terminal column counting and pre-wrapping. Wide (East Asian W/F) characters
+occupy two columns, combining marks none, so that lines break exactly where
+the captured terminal broke them.
+"""
+
+import bisect
+import re
+import unicodedata
+from functools import lru_cache
+
+# East Asian Width 为 W/F 的码位区间（由 Unicode 14.0 数据生成，
+# 区间之间的未分配码位已合并）
+WIDE_RANGES = (
+    (0x1100, 0x115F), (0x231A, 0x231B), (0x2329, 0x232A), (0x23E9, 0x23EC),
+    (0x23F0, 0x23F0), (0x23F3, 0x23F3), (0x25FD, 0x25FE), (0x2614, 0x2615),
+    (0x2648, 0x2653), (0x267F, 0x267F), (0x2693, 0x2693), (0x26A1, 0x26A1),
+    (0x26AA, 0x26AB), (0x26BD, 0x26BE), (0x26C4, 0x26C5), (0x26CE, 0x26CE),
+    (0x26D4, 0x26D4), (0x26EA, 0x26EA), (0x26F2, 0x26F3), (0x26F5, 0x26F5),
+    (0x26FA, 0x26FA), (0x26FD, 0x26FD), (0x2705, 0x2705), (0x270A, 0x270B),
+    (0x2728, 0x2728), (0x274C, 0x274C), (0x274E, 0x274E), (0x2753, 0x2755),
+    (0x2757, 0x2757), (0x2795, 0x2797), (0x27B0, 0x27B0), (0x27BF, 0x27BF),
+    (0x2B1B, 0x2B1C), (0x2B50, 0x2B50), (0x2B55, 0x2B55), (0x2E80, 0x303E),
+    (0x3041, 0x3247), (0x3250, 0x4DBF), (0x4E00, 0xA4C6), (0xA960, 0xA97C),
+    (0xAC00, 0xD7A3), (0xF900, 0xFAD9), (0xFE10, 0xFE19), (0xFE30, 0xFE6B),
+    (0xFF01, 0xFF60), (0xFFE0, 0xFFE6), (0x16FE0, 0x1B2FB), (0x1F004, 0x1F004),
+    (0x1F0CF, 0x1F0CF), (0x1F18E, 0x1F18E), (0x1F191, 0x1F19A),
+    (0x1F200, 0x1F320), (0x1F32D, 0x1F335), (0x1F337, 0x1F37C),
+    (0x1F37E, 0x1F393), (0x1F3A0, 0x1F3CA), (0x1F3CF, 0x1F3D3),
+    (0x1F3E0, 0x1F3F0), (0x1F3F4, 0x1F3F4), (0x1F3F8, 0x1F43E),
+    (0x1F440, 0x1F440), (0x1F442, 0x1F4FC), (0x1F4FF, 0x1F53D),
+    (0x1F54B, 0x1F54E), (0x1F550, 0x1F567), (0x1F57A, 0x1F57A),
+    (0x1F595, 0x1F596), (0x1F5A4, 0x1F5A4), (0x1F5FB, 0x1F64F),
+    (0x1F680, 0x1F6C5), (0x1F6CC, 0x1F6CC), (0x1F6D0, 0x1F6D2),
+    (0x1F6D5, 0x1F6DF), (0x1F6EB, 0x1F6EC), (0x1F6F4, 0x1F6FC),
+    (0x1F7E0, 0x1F7F0), (0x1F90C, 0x1F93A), (0x1F93C, 0x1F945),
+    (0x1F947, 0x1F9FF), (0x1FA70, 0x1FAF6), (0x20000, 0x3FFFD),
+)
+_WIDE_STARTS = tuple(start for start, _ in WIDE_RANGES)
+
+TAB_SIZE = 8
+SGR_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+HEADER_COLUMNS_PATTERN = re.compile(rb'COLUMNS="(\d+)"')
+_SIMPLE_LINE = re.compile(r"^[\x20-\x7e]*$")
+
+
+@lru_cache(maxsize=4096)
+def char_width(ch):
+    """返回字符在终端中占用的列数（0、1 或 2）"""
+    cp = ord(ch)
+    if cp < 0x300:
+        return 1 if cp >= 0x20 and cp != 0x7F else 0
+    if unicodedata.category(ch) in ("Mn", "Me", "Cf"):
+        return 0
+    i = bisect.bisect_right(_WIDE_STARTS, cp) - 1
+    if i >= 0 and cp <= WIDE_RANGES[i][1]:
+        return 2
+    return 1
+
+
+def parse_header_columns(header):
+    """
+    从 script 头部行解析终端宽度
+
+    Args:
+        header: 日志首行（bytes），如 b'Script started on ... COLUMNS="212" ...'
+
+    Returns:
+        int: 终端列数，未记录时返回 None
+    """
+    if not header.startswith(b"Script started on "):
+        return None
+    match = HEADER_COLUMNS_PATTERN.search(header)
+    return int(match.group(1)) if match else None
+
+
+def wrap_line(line, columns):
+    """
+    按终端列数折行（单行，不含换行符）
+
+    SGR 序列不占宽度；制表符按每 8 列对齐（最多到行末）；放不下的宽字符整体移到下一行。
+
+    Returns:
+        str: 插入了换行符的文本
+    """
+    if "\t" not in line and len(line) * 2 <= columns:
+        return line
+    if _SIMPLE_LINE.match(line):
+        return "\n".join(
+            line[i : i + columns] for i in range(0, len(line), columns)
+        )
+
+    out = []
+    col = 0
+    pos = 0
+    length = len(line)
+    while pos < length:
+        ch = line[pos]
+        if ch == "\x1b":
+            match = SGR_PATTERN.match(line, pos)
+            if match:
+                out.append(match.group(0))
+                pos = match.end()
+                continue
+        if ch == "\t":
+            # 与终端一致：制表符最多前进到行末，不引起折行
+            width = min(TAB_SIZE - col % TAB_SIZE, columns - col)
+        elif ch == "\r":
+            col = 0
+            out.append(ch)
+            pos += 1
+            continue
+        else:
+            width = char_width(ch)
+        if width and col + width > columns:
+            out.append("\n")
+            col = 0
+        out.append(ch)
+        col += width
+        pos += 1
+    return "".join(out)
+
+
+def prewrap(text, columns):
+    """按终端列数对多行文本逐行折行；columns 为空或非正数时原样返回"""
+    if not columns or columns <= 0:
+        return text
+    return "\n".join(wrap_line(line, columns) for line in text.split("\n"))
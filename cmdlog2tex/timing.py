@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Timing Module for cmdlog2tex
+
+Parse 'script' timing files (``script -T``) and map transcript byte
+offsets to elapsed time, so that commands can be timed, annotated and
+ranked.
+
+Both timing formats written by util-linux are supported::
+
+    classic:   <delay> <bytes>
+    advanced:  <type> <delay> <bytes|info>   (only 'O' output entries count)
+"""
+
+import array
+import bisect
+
+from .ansindex import ANSI_PATTERN
+
+TIMING_SUFFIX = ".timing"
+
+
+def timing_path(log_path):
+    """获取日志文件对应的时间文件路径（<日志>.timing）"""
+    return log_path + TIMING_SUFFIX
+
+
+class Timeline:
+    """Cumulative (elapsed time, byte offset) pairs of a transcript."""
+
+    def __init__(self, times, ends, base_offset=0):
+        """
+        Args:
+            times: 每个输出块写出时的累计时间（秒，array('d')）
+            ends: 每个输出块结束时的累计字节数（array('Q')）
+            base_offset: 输出数据在日志文件中的起始偏移（script 头部行长度）
+        """
+        self.times = times
+        self.ends = ends
+        self.base_offset = base_offset
+
+    @classmethod
+    def parse(cls, text, base_offset=0):
+        """从时间文件内容解析时间线"""
+        times = array.array("d")
+        ends = array.array("Q")
+        elapsed = 0.0
+        total = 0
+        for line in text.splitlines():
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0].isalpha():
+                # 高级格式：仅 O（输出）条目对应日志中的数据
+                if len(fields) < 3:
+                    continue
+                kind, fields = fields[0], fields[1:]
+                try:
+                    elapsed += float(fields[0])
+                except ValueError:
+                    continue
+                if kind != "O":
+                    continue
+            else:
+                try:
+                    elapsed += float(fields[0])
+                except ValueError:
+                    continue
+            try:
+                total += int(fields[1])
+            except (IndexError, ValueError):
+                continue
+            times.append(elapsed)
+            ends.append(total)
+        return cls(times, ends, base_offset)
+
+    @property
+    def duration(self):
+        return self.times[-1] if self.times else 0.0
+
+    def time_at(self, offset):
+        """返回日志中 offset 处字节被写出时的累计时间（秒）"""
+        if not self.ends:
+            return 0.0
+        pos = max(0, offset - self.base_offset)
+        i = bisect.bisect_right(self.ends, pos)
+        if i >= len(self.times):
+            return self.times[-1]
+        return self.times[i]
+
+
+def load_timeline(path, base_offset=0):
+    """
+    加载时间文件
+
+    Args:
+        path: 时间文件路径
+        base_offset: 输出数据在日志中的起始偏移（script 头部行长度）
+    """
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return Timeline.parse(f.read(), base_offset)
+
+
+def command_times(index, timeline):
+    """
+    计算每个命令的开始时间与耗时
+
+    命令耗时按其提示符行到下一个提示符行（或会话结束）之间的时间计算。
+
+    Returns:
+        list: [(命令序号(1起), 提示符行号(0起), 开始时间, 耗时), ...]
+    """
+    result = []
+    commands = index.commands
+    for i, line in enumerate(commands):
+        start = timeline.time_at(index.offsets[line])
+        if i + 1 < len(commands):
+            end = timeline.time_at(index.offsets[commands[i + 1]])
+        else:
+            end = timeline.duration
+        result.append((i + 1, line, start, max(0.0, end - start)))
+    return result
+
+
+def command_text(f, index, line):
+    """从日志文件中提取提示符行的可读文本（去除ANSI序列与首尾空白）"""
+    f.seek(index.offsets[line])
+    text = f.read(index.offsets[line + 1] - index.offsets[line])
+    return ANSI_PATTERN.sub(b"", text).decode("utf-8", "ignore").strip()
+
+
+def format_elapsed(seconds):
+    """格式化时间为页边注释文本"""
+    return f"[{seconds:8.2f}s] "
+
+
+def annotate(data, index, times, start, end, margin=False, slow=None):
+    """
+    在日志切片中插入时间注释
+
+    Args:
+        data: 第 [start, end) 行的日志内容
+        index: 完整日志的 LogIndex
+        times: command_times() 的结果
+        start: 切片起始行（0起）
+        end: 切片结束行（不含）
+        margin: 是否在每个提示符行前标注自会话开始以来的时间
+        slow: 耗时不少于该秒数的命令在其输出后追加提示行
+
+    Returns:
+        bytes: 插入注释后的内容
+    """
+    base = index.offsets[start]
+    inserts = []
+    for number, line, started, elapsed in times:
+        if margin and start <= line < end:
+            inserts.append((index.offsets[line] - base, format_elapsed(started)))
+        if slow is not None and elapsed >= slow:
+            next_line = index.command_lines(number)[1]
+            if start < next_line <= end:
+                note = f"[slow] command {number} took {elapsed:.2f}s\n"
+                inserts.append((index.offsets[next_line] - base, note))
+    if not inserts:
+        return data
+
+    parts = []
+    pos = 0
+    for offset, text in sorted(inserts, key=lambda item: item[0]):
+        parts.append(data[pos:offset])
+        parts.append(text.encode("utf-8"))
+        pos = offset
+    parts.append(data[pos:])
+    return b"".join(parts)
@@ -55,6 +55,7 @@ class PostInstallCommand(install):
         print("\nInstalled commands:")
         print("  cmd2tex - Execute command streams and convert to LaTeX")
         print("  log2tex - Convert logs to LaTeX")
+        print("  cmd2tex-pool - Keep warm login shells for cmd2tex --pool")
         print("\nTry: cmd2tex --help")
         print("     log2tex --help")
         print("=" * 60 + "\n")
@@ -92,6 +93,7 @@ setup(
         "console_scripts": [
             "cmd2tex=cmdlog2tex.cmd2tex:main",
             "log2tex=cmdlog2tex.log2tex:main",
+            "cmd2tex-pool=cmdlog2tex.shellpool:main",
         ],
     },
     cmdclass={
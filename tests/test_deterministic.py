@@ -0,0 +1,97 @@
+"""log2tex 在重复运行与并行运行时生成逐字节相同的输出"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_LOG = os.path.join(REPO, "demo_commands.ansilog")
+
+HASH_SEEDS = ["0", "1", "42", "4294967295", "random"]
+
+
+def start(out_path, *options, seed="0"):
+    env = dict(os.environ, PYTHONPATH=REPO, PYTHONHASHSEED=seed)
+    cmd = [sys.executable, "-m", "cmdlog2tex.log2tex", "-o", out_path, *options]
+    return subprocess.Popen(cmd, env=env, stderr=subprocess.PIPE)
+
+
+def finish(proc):
+    _, err = proc.communicate(timeout=60)
+    assert proc.returncode == 0, err.decode("utf-8", "replace")
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / "demo.ansilog"
+    shutil.copyfile(DEMO_LOG, path)
+    return str(path)
+
+
+@pytest.mark.parametrize("mode", ["--colored", "--plain"])
+@pytest.mark.parametrize(
+    "extra",
+    [[], ["--theme", "light"], ["--command", "2"]],
+    ids=["default", "light", "command"],
+)
+def test_repeated_runs_across_hash_seeds(tmp_path, log, mode, extra):
+    outputs = []
+    for seed in HASH_SEEDS:
+        out = str(tmp_path / f"out-{seed}.tex")
+        finish(start(out, "-i", log, mode, *extra, seed=seed))
+        outputs.append(read(out))
+    assert len(set(outputs)) == 1
+
+
+@pytest.mark.parametrize(
+    "cache", [[], ["--cache-dir"], ["--cache-dir", "--cache-link"]],
+    ids=["uncached", "cached", "linked"],
+)
+def test_parallel_runs(tmp_path, log, cache):
+    if cache:
+        cache = [cache[0], str(tmp_path / "cache")] + cache[1:]
+    reference = str(tmp_path / "reference.tex")
+    finish(start(reference, "-i", log))
+    expected = read(reference)
+
+    # 首轮并行运行同时写入缓存，第二轮并行运行命中缓存
+    for round_ in range(2):
+        procs = []
+        for i, seed in enumerate(HASH_SEEDS * 2):
+            out = str(tmp_path / f"parallel-{round_}-{i}.tex")
+            procs.append((out, start(out, "-i", log, *cache, seed=seed)))
+        for out, proc in procs:
+            finish(proc)
+            assert read(out) == expected
+
+    # 所有进程写入同一个输出文件
+    shared = str(tmp_path / "shared.tex")
+    procs = [start(shared, "-i", log, *cache, seed=seed) for seed in HASH_SEEDS * 2]
+    for proc in procs:
+        finish(proc)
+    assert read(shared) == expected
+
+
+def test_parallel_index_builds(tmp_path, log):
+    """并行切片转换同时生成 .idx 索引时结果一致"""
+    reference = str(tmp_path / "reference.tex")
+    finish(start(reference, "-i", log, "--command", "3"))
+    expected = read(reference)
+
+    for _ in range(3):
+        os.remove(log + ".idx")
+        procs = []
+        for i, seed in enumerate(HASH_SEEDS * 2):
+            out = str(tmp_path / f"slice-{i}.tex")
+            procs.append((out, start(out, "-i", log, "--command", "3", seed=seed)))
+        for out, proc in procs:
+            finish(proc)
+            assert read(out) == expected
@@ -0,0 +1,95 @@
+"""log2tex --watch 增量转换与一次性转换结果一致"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_LOG = os.path.join(REPO, "demo_commands.ansilog")
+
+COLOR_SPANNING_LOG = (
+    b"plain line before\n"
+    b"\x1b[31mred line one\n"
+    b"red line two\n"
+    b"red line three\x1b[0m back to plain\n"
+    b"\x1b[1;32mbold green one\n"
+    b"bold green two\x1b[0m\n"
+    b"\x1b[34mstill blue at the end\n"
+    b"and unterminated"
+)
+
+REDRAW_LOG = (
+    b"Downloading\n"
+    b"progress 10%\n"
+    b"\x1b[1A\x1b[2Kprogress 50%\n"
+    b"\x1b[1A\x1b[2Kprogress 100%\n"
+    b"done\n"
+)
+
+
+def log2tex(*args):
+    env = dict(os.environ, PYTHONPATH=REPO)
+    return [sys.executable, "-m", "cmdlog2tex.log2tex", *args], env
+
+
+def one_shot(log_path, out_path, *options):
+    cmd, env = log2tex("-i", log_path, "-o", out_path, *options)
+    subprocess.run(cmd, env=env, check=True, stderr=subprocess.DEVNULL)
+    with open(out_path, "rb") as f:
+        return f.read()
+
+
+def split_pieces(data, pieces):
+    step = max(1, len(data) // pieces)
+    return [data[pos : pos + step] for pos in range(0, len(data), step)]
+
+
+def watched(data, log_path, out_path, *options, by_line=False):
+    """将 data 分若干次（或逐行）追加到 log_path，由 --watch 转换"""
+    open(log_path, "wb").close()
+    cmd, env = log2tex(
+        "-i", log_path, "-o", out_path, "--watch", "--interval", "0", *options
+    )
+    proc = subprocess.Popen(cmd, env=env, stderr=subprocess.DEVNULL)
+    try:
+        chunks = data.splitlines(keepends=True) if by_line else split_pieces(data, 6)
+        for chunk in chunks:
+            with open(log_path, "ab") as f:
+                f.write(chunk)
+            # 等待监视进程读取本段，使每段分别转换
+            time.sleep(0.5)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+    assert proc.returncode == 0
+    with open(out_path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("mode", ["--colored", "--plain"])
+@pytest.mark.parametrize("source", ["color-spanning", "redraw", "demo"])
+def test_watch_matches_one_shot(tmp_path, mode, source):
+    if source == "demo":
+        with open(DEMO_LOG, "rb") as f:
+            data = f.read()
+    elif source == "redraw":
+        data = REDRAW_LOG
+    else:
+        data = COLOR_SPANNING_LOG
+
+    full = tmp_path / "full.ansilog"
+    full.write_bytes(data)
+    expected = one_shot(str(full), str(tmp_path / "full.tex"), mode)
+
+    actual = watched(
+        data,
+        str(tmp_path / "live.ansilog"),
+        str(tmp_path / "live.tex"),
+        mode,
+        by_line=source == "redraw",
+    )
+    assert actual == expected